@@ -17,16 +17,14 @@ from vertexone_watersmart.exceptions import (
     UnauthorizedException,
     UnknownException,
 )
-from vertexone_watersmart.providers import PROVIDER_LIST
-
-from .const import DOMAIN, CONF_DISTRICT_NAME
+from .const import DOMAIN, CONF_DISTRICT_NAME, PROVIDER_BY_NAME, PROVIDER_NAMES_SORTED
 
 
 _LOGGER = logging.getLogger(__name__)
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
-        vol.Required(CONF_DISTRICT_NAME): vol.In(sorted([v for _, v in PROVIDER_LIST.items()])),
+        vol.Required(CONF_DISTRICT_NAME): vol.In(PROVIDER_NAMES_SORTED),
         vol.Required(CONF_USERNAME): str,
         vol.Required(CONF_PASSWORD): str,
     }
@@ -37,8 +35,7 @@ async def _validate_login(
     hass: HomeAssistant, login_data: dict[str, str]
 ) -> dict[str, str]:
     """Validate login data and return any errors."""
-    providers = {v: k for k, v in PROVIDER_LIST.items()}
-    provider = providers[login_data[CONF_DISTRICT_NAME]]
+    provider = PROVIDER_BY_NAME[login_data[CONF_DISTRICT_NAME]]
     api = Client(provider=provider, is_async=True)
     errors: dict[str, str] = {}
     try:
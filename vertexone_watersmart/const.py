@@ -1,10 +1,17 @@
 from enum import StrEnum
 from typing import Final
 
+from vertexone_watersmart.providers import PROVIDER_LIST
+
 DOMAIN: Final = "vertexone_watersmart"
 NAME: Final = "VertexOne WaterSmart"
 CONF_DISTRICT_NAME: Final = "district"
 
+# Reverse mapping and sorted district names, computed once at import and
+# shared by the config flow and the coordinator.
+PROVIDER_BY_NAME: Final = {v: k for k, v in PROVIDER_LIST.items()}
+PROVIDER_NAMES_SORTED: Final = tuple(sorted(PROVIDER_BY_NAME))
+
 
 class SENSOR_TYPES(StrEnum):
     CONSUMPTION: Final = "water_consumption"
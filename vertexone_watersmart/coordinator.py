@@ -1,15 +1,14 @@
 """Coordinator to handle Watersmart connections."""
-import itertools
+import bisect
 import logging
-import statistics
+import operator
+import time
+from collections import deque
 from datetime import datetime, timedelta, timezone
 from types import MappingProxyType
-from typing import Any, cast
+from typing import Any, Final, cast
 from dataclasses import dataclass
 
-from homeassistant.components.recorder.db_schema import (
-    States,
-)
 from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
 from homeassistant.components.recorder.statistics import (
     async_import_statistics,
@@ -30,39 +29,50 @@ from homeassistant.helpers import aiohttp_client
 from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from vertexone_watersmart.client import Client
-from vertexone_watersmart.providers import PROVIDER_LIST
 
-from .const import DOMAIN, NAME, CONF_DISTRICT_NAME
+from .const import DOMAIN, NAME, CONF_DISTRICT_NAME, PROVIDER_BY_NAME
 from .utils import (
+    INSERT_CHUNK_SIZE,
     TimeBlocs,
-    get_or_create,
+    get_empty_attributes_id,
+    get_entity_snapshot,
     save_states,
-    get_last_known_state,
-    get_last_known_statistic,
-    delete_invalid_states,
 )
 from homeassistant.util import dt as dt_util
 
 _LOGGER = logging.getLogger(__name__)
 
 
-@dataclass
+async def _retry(coro_factory, retries=3):
+    """Await the coroutine built by coro_factory, retrying on failure.
+
+    The factory is called again on each attempt since a coroutine
+    cannot be awaited twice.
+    """
+    while True:
+        try:
+            return await coro_factory()
+        except Exception as e:
+            if retries <= 0:
+                raise
+            _LOGGER.debug(e)
+            retries -= 1
+
+
+@dataclass(slots=True)
 class V1WSEntityDescriptionMixin:
     """Mixin values for required keys."""
 
     api_value_key: str
     period: str
 
-    def value_fn(self, data):
-        return data[self.api_value_key]
 
-
-@dataclass
+@dataclass(slots=True)
 class V1WSEntityDescription(SensorEntityDescription, V1WSEntityDescriptionMixin):
     """Class describing sensors entities."""
 
 
-ENTITIES: list[V1WSEntityDescription] = [
+ENTITIES: Final[tuple[V1WSEntityDescription, ...]] = (
     V1WSEntityDescription(
         key="hourly_water_consumption",
         name="Hourly Water Consumption",
@@ -123,7 +133,17 @@ ENTITIES: list[V1WSEntityDescription] = [
         period="daily",
         api_value_key="precipitation",
     ),
-]
+)
+
+# Pre-bucket the entities by period once at import so each refresh can
+# iterate them without rebuilding the filter lists.
+_by_period: dict[str, list[V1WSEntityDescription]] = {}
+for _e in ENTITIES:
+    _by_period.setdefault(_e.period, []).append(_e)
+ENTITIES_BY_PERIOD: Final[dict[str, tuple[V1WSEntityDescription, ...]]] = {
+    period: tuple(group) for period, group in _by_period.items()
+}
+SENSOR_PERIOD_TYPES: Final = tuple(ENTITIES_BY_PERIOD)
 
 
 class V1WSCoordinator(DataUpdateCoordinator[dict[str, object]]):
@@ -149,173 +169,225 @@ class V1WSCoordinator(DataUpdateCoordinator[dict[str, object]]):
             ),
         )
 
-        providers = {v: k for k, v in PROVIDER_LIST.items()}
-        provider = providers[entry_data[CONF_DISTRICT_NAME]]
+        provider = PROVIDER_BY_NAME[entry_data[CONF_DISTRICT_NAME]]
 
         self.api = Client(provider=provider, is_async=True)
         self.account = entry_data[CONF_USERNAME]
         self.entry_data = entry_data
+        # fetch() re-authenticates internally on every call, so the explicit
+        # login is only needed once, to validate the credentials.
+        self._login_validated = False
+        # metadata ids are stable for the lifetime of the process.
+        self._metadata_ids: dict[str, int] = {}
+        self._empty_attrs_id: int | None = None
 
     async def update_data(self) -> dict[str, object]:
         """Fetch data from API endpoint."""
-        t0 = datetime.now()
+        # Only pay for phase timing when debug logging is on.
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        t0 = time.perf_counter_ns() if debug else 0
         datapoints = {}
 
         states = []
-        old_states = {}
         state_meta_ids = {}
         stats = {}
-        stats_meta_ids = {}
         stats_meta = {}
         last_states = {}
         last_stats = {}
-        sensor_period_type = list(set([s.period for s in ENTITIES]))
-
-        for entity_type in sensor_period_type:
-            retry = 3
-            while retry >= 0:
-                try:
-                    await self.api.login(
+        sensor_period_type = SENSOR_PERIOD_TYPES
+
+        # Validate the credentials with one explicit login on the first
+        # poll; the client re-authenticates internally on every fetch, so
+        # repeating it each poll only added a redundant round trip.
+        if not self._login_validated:
+            try:
+                await _retry(
+                    lambda: self.api.login(
                         self.entry_data[CONF_USERNAME], self.entry_data[CONF_PASSWORD]
                     )
-                    break
-                except Exception as e:
-                    _LOGGER.debug(e)
-                    retry -= 1
-            if retry < 0:
-                _LOGGER.error("Failed to login to vertexone watersmart")
-                continue
-            # get the api according to the period (daily or hourly).
-            # The API provides 1 year+ of data every time.
-            api = getattr(self.api, entity_type)
-            retry = 3
-            while retry >= 0:
-                try:
-                    t1 = datetime.now()
-                    datapoints[entity_type] = await api.fetch()
-                    _LOGGER.debug("fetch data took %s", datetime.now() - t1)
-                    break
-                except Exception as e:
-                    _LOGGER.debug(e)
-                    retry -= 1
-            if retry < 0:
-                _LOGGER.error("Failed to fetch data for vertexone watersmart")
-                continue
-            entities = [e for e in ENTITIES if e.period == entity_type]
-
-            for entity in entities:
-                t1 = datetime.now()
-                state_meta_ids[entity.key] = await get_or_create(
-                    self.hass, id=f"sensor.{entity.key}"
-                )
-                _LOGGER.debug(
-                    "get %s metadata took %s",
-                    f"sensor.{entity.key}",
-                    datetime.now() - t1,
-                )
-                t1 = datetime.now()
-                last_states[entity.key] = await get_last_known_state(
-                    self.hass, f"sensor.{entity.key}"
                 )
-                _LOGGER.debug(
-                    "get %s last state took %s",
-                    f"sensor.{entity.key}",
-                    datetime.now() - t1,
+            except Exception:
+                _LOGGER.error("Failed to login to vertexone watersmart")
+                return {self.account: {}}
+            self._login_validated = True
+
+        # Fetch the periods sequentially: Client.daily / Client.hourly are
+        # properties that reconfigure and return one shared fetcher, so
+        # concurrent fetches would both hit whichever endpoint was selected
+        # last. The API provides 1 year+ of data every time.
+        t1 = time.perf_counter_ns() if debug else 0
+        for entity_type in sensor_period_type:
+            try:
+                datapoints[entity_type] = await _retry(
+                    getattr(self.api, entity_type).fetch
                 )
-
-                t1 = datetime.now()
-                last_stats[entity.key] = await get_last_known_statistic(
-                    self.hass, f"sensor.{entity.key}"
+            except Exception:
+                _LOGGER.error(
+                    "Failed to fetch %s data for vertexone watersmart", entity_type
                 )
+        if debug:
+            _LOGGER.debug("fetch data took %.3f ms", (time.perf_counter_ns() - t1) / 1e6)
+
+        for entity_type in list(datapoints):
+            entities = ENTITIES_BY_PERIOD[entity_type]
+
+            # One batched recorder round trip for all entities of the period:
+            # metadata ids, invalid-state cleanup, last states, last stats.
+            t1 = time.perf_counter_ns() if debug else 0
+            snapshot = await get_entity_snapshot(
+                self.hass,
+                [f"sensor.{entity.key}" for entity in entities],
+                known_metadata_ids=self._metadata_ids,
+            )
+            for entity in entities:
+                snap = snapshot[f"sensor.{entity.key}"]
+                state_meta_ids[entity.key] = snap["metadata_id"]
+                self._metadata_ids[f"sensor.{entity.key}"] = snap["metadata_id"]
+                last_states[entity.key] = {"last_changed_ts": snap["last_changed_ts"]}
+                last_stats[entity.key] = snap["last_stat"]
+            if debug:
                 _LOGGER.debug(
-                    "get %s last stat took %s",
-                    f"sensor.{entity.key}",
-                    datetime.now() - t1,
+                    "entity recorder lookups took %.3f ms",
+                    (time.perf_counter_ns() - t1) / 1e6,
                 )
 
-                t1 = datetime.now()
-                await delete_invalid_states(self.hass, state_meta_ids[entity.key])
-                _LOGGER.debug("delete invalid states took %s", datetime.now() - t1)
-
             dataset = datapoints[entity_type]
-            last_values = []
+            if not dataset:
+                continue
 
-            # record historical sensor states, to be visible as a sensor history, not only statistics.
-            last_idx = 1
-
-            t1 = datetime.now()
-            for i, d in enumerate(dataset):
-                offset = datetime.fromtimestamp(
-                    d["ts"], tz=dt_util.DEFAULT_TIME_ZONE
-                ) - datetime.fromtimestamp(d["ts"], tz=timezone.utc)
-                dt1 = datetime.fromtimestamp(d["ts"], tz=timezone.utc)
-                # + offset
-                dt1 = datetime.fromtimestamp(d["ts"], tz=timezone.utc).replace(
+            # The vendor publishes new data every 12 to 24h, so most 6h polls
+            # fetch nothing new: when the newest row is not ahead of what is
+            # already recorded for every entity of this period, skip the
+            # state and statistics pipeline entirely.
+            newest_dt = dt_util.as_local(
+                datetime.fromtimestamp(dataset[-1]["ts"], tz=timezone.utc).replace(
                     tzinfo=None
                 )
-                dt2 = dt_util.as_local(dt1)
-                # ts needs to be corrected as it is a non-standard unix timestamp. It includes a timezone offset
-                # so that the UTC timestamp is actually the time in the local timezone.
-                # We load it as a UTC timestamp so it is not changed, then strip the timezone info
-                # and transform it to a localized datetime.
-                # to get a real UTC timestamp.
-                ts = dt_util.as_local(
+            )
+            newest_ts = newest_dt.timestamp()
+            newest_bucket_ts = TimeBlocs(entity_type).fn_dt(newest_dt).timestamp()
+            if all(
+                last_states[entity.key]["last_changed_ts"] is not None
+                and newest_ts <= last_states[entity.key]["last_changed_ts"]
+                and last_stats[entity.key] is not None
+                and newest_bucket_ts <= last_stats[entity.key]["start"]
+                for entity in entities
+            ):
+                _LOGGER.debug("no new %s data, skipping import", entity_type)
+                continue
+
+            # Resolve the shared empty-attributes row once per process; the
+            # imported rows all point at it.
+            if self._empty_attrs_id is None:
+                self._empty_attrs_id = await get_empty_attributes_id(self.hass)
+
+            # Extract each entity's value column once with a C-level getter,
+            # so the row loops below index a plain list instead of doing a
+            # dict lookup per (row, entity) pair.
+            columns = {
+                entity.key: list(
+                    map(operator.itemgetter(entity.api_value_key), dataset)
+                )
+                for entity in entities
+            }
+
+            # record historical sensor states, to be visible as a sensor history, not only statistics.
+            t1 = time.perf_counter_ns() if debug else 0
+            # ts needs to be corrected as it is a non-standard unix timestamp. It includes a timezone offset
+            # so that the UTC timestamp is actually the time in the local timezone.
+            # We load it as a UTC timestamp so it is not changed, then strip the timezone info
+            # and transform it to a localized datetime.
+            # to get a real UTC timestamp.
+            # One fused pass over the rows: localize each timestamp once and
+            # derive both the state timestamps and the contiguous bucket
+            # spans ((start, stop) per bucket) from the same datetime.
+            tb_fn = TimeBlocs(entity_type).fn_dt
+            row_ts = []
+            grouped_spans = []
+            prev_key = None
+            span_start = 0
+            for idx, d in enumerate(dataset):
+                local = dt_util.as_local(
                     datetime.fromtimestamp(d["ts"], tz=timezone.utc).replace(
                         tzinfo=None
                     )
-                ).timestamp()
-                if i == 0:
-                    _LOGGER.debug(
-                        "orig_ts: %s, fromts: %s, localdt: %s, ts: %s, tz: %s",
-                        d["ts"],
-                        dt1,
-                        dt2,
-                        ts,
-                        dt_util.DEFAULT_TIME_ZONE,
-                    )
-
-                for entity in entities:
-                    # skip records that have already been seen.
-                    if entity.key not in old_states:
-                        old_states[entity.key] = last_states[entity.key]
+                )
+                row_ts.append(local.timestamp())
+                key = tb_fn(local)
+                if key != prev_key:
+                    if prev_key is not None:
+                        # keep the POSIX timestamp alongside the datetime so
+                        # the per-entity loop compares floats directly.
+                        grouped_spans.append(
+                            (prev_key, prev_key.timestamp(), span_start, idx)
+                        )
+                    prev_key = key
+                    span_start = idx
+            if prev_key is not None:
+                grouped_spans.append(
+                    (prev_key, prev_key.timestamp(), span_start, len(dataset))
+                )
+            span_ts = [s[1] for s in grouped_spans]
+            _LOGGER.debug(
+                "orig_ts: %s, ts: %s, tz: %s",
+                dataset[0]["ts"],
+                row_ts[0],
+                dt_util.DEFAULT_TIME_ZONE,
+            )
 
-                    if (
-                        last_states[entity.key]["last_changed_ts"] is not None
-                        and ts <= last_states[entity.key]["last_changed_ts"]
-                    ):
-                        last_idx += 1
-                        continue
+            for entity in entities:
+                # skip records that have already been seen: row_ts is time
+                # ordered, so the seen rows are a strict prefix and one
+                # bisect finds the first new row.
+                last_ts = last_states[entity.key]["last_changed_ts"]
+                first_new = (
+                    bisect.bisect_right(row_ts, last_ts)
+                    if last_ts is not None
+                    else 0
+                )
 
+                meta_id = state_meta_ids[entity.key]
+                column = columns[entity.key]
+                # rolling window of the last 5 values plus a monotonic
+                # companion deque, so the window minimum is O(1) per row
+                # instead of a scan.
+                window = deque(maxlen=5)
+                mono = deque()
+                for i in range(first_new, len(dataset)):
                     if entity.key == "hourly_water_leak_computed":
-                        last_values.append(d[entity.api_value_key])
-                        # trim last values set
-                        last_values = last_values[-5:]
-                        state = min(last_values)
+                        v = column[i]
+                        if len(window) == window.maxlen and mono[0] == window[0]:
+                            mono.popleft()
+                        window.append(v)
+                        while mono and mono[-1] > v:
+                            mono.pop()
+                        mono.append(v)
+                        state = mono[0]
                     else:
-                        state = d[entity.api_value_key]
-
-                    new_state = States(
-                        state=state,
-                        metadata_id=state_meta_ids[entity.key],
-                        last_changed_ts=ts,
-                        last_updated_ts=ts,
-                        old_state=old_states[entity.key] if i >= last_idx else None,
+                        state = column[i]
+
+                    # plain mappings: bulk_insert_mappings skips the ORM
+                    # unit of work entirely. The recorder tolerates a null
+                    # old_state linkage on imported history.
+                    states.append(
+                        {
+                            "state": state,
+                            "metadata_id": meta_id,
+                            "attributes_id": self._empty_attrs_id,
+                            "last_changed_ts": row_ts[i],
+                            "last_updated_ts": row_ts[i],
+                        }
                     )
 
-                    states.append(new_state)
-                    old_states[entity.key] = new_state
-
-            _LOGGER.debug("parsing data to states took %s", datetime.now() - t1)
+            if debug:
+                _LOGGER.debug(
+                    "parsing data to states took %.3f ms",
+                    (time.perf_counter_ns() - t1) / 1e6,
+                )
 
-            t1 = datetime.now()
             # save states and build statistics.
             for entity in entities:
-                t1 = datetime.now()
-                if entity.key not in stats_meta:
-                    stats_meta[entity.key] = {}
-                if entity.key not in stats:
-                    stats[entity.key] = {}
-
+                t1 = time.perf_counter_ns() if debug else 0
                 # build stats
                 stats[entity.key] = []
                 stats_meta[entity.key] = StatisticMetaData(
@@ -328,70 +400,79 @@ class V1WSCoordinator(DataUpdateCoordinator[dict[str, object]]):
                 )
 
                 accumulated = 0
-                for dt, collection_it in itertools.groupby(
-                    dataset, key=TimeBlocs(entity_type).fn
-                ):
-                    if (
-                        last_stats[entity.key] is not None
-                        and dt.timestamp() <= last_stats[entity.key]["start"]
-                    ):
-                        continue
+                column = columns[entity.key]
+                # the dataset is time-ordered, so buckets at or before the
+                # last imported statistic form a strict prefix; skip it in
+                # one bisect instead of a comparison per bucket.
+                first = 0
+                if last_stats[entity.key] is not None:
+                    first = bisect.bisect_right(
+                        span_ts, last_stats[entity.key]["start"]
+                    )
+                for dt, dt_ts, start, stop in grouped_spans[first:]:
                     dttt = dt.timetuple()
                     if (dttt.tm_hour == 0 and entity_type == "daily") or (
                         dttt.tm_min == 0 and entity_type == "hourly"
                     ):
                         accumulated = 0
-                    collection = list(collection_it)
-                    values = [
-                        x[entity.api_value_key]
-                        for x in collection
-                        if x[entity.api_value_key] is not None
-                    ]
-                    mean = 0
-                    if len(values) > 0:
-                        mean = statistics.mean(values)
-                    partial_sum = sum(values)
+                    # single pass over the bucket: sum and count together, no
+                    # intermediate values list.
+                    partial_sum = 0.0
+                    count = 0
+                    for v in column[start:stop]:
+                        if v is not None:
+                            partial_sum += v
+                            count += 1
+                    mean = partial_sum / count if count else 0
                     accumulated = accumulated + partial_sum
 
+                    # no last_reset: the meter does not reset per bucket, and
+                    # emitting one per row forces the statistics engine to
+                    # store a reset marker each time.
                     stats[entity.key].append(
                         StatisticData(
                             start=dt,
-                            # end=end_time,
                             state=partial_sum,
                             mean=mean,
                             sum=accumulated,
-                            last_reset=dt,
                         )
                     )
-                _LOGGER.debug(
-                    "parsing %s stats took %s",
-                    f"sensor.{entity.key}",
-                    datetime.now() - t1,
-                )
+                if debug:
+                    _LOGGER.debug(
+                        "parsing sensor.%s stats took %.3f ms",
+                        entity.key,
+                        (time.perf_counter_ns() - t1) / 1e6,
+                    )
 
-                t1 = datetime.now()
-                if len(stats[entity.key]) > 0:
+                t1 = time.perf_counter_ns() if debug else 0
+                entity_stats = stats[entity.key]
+                # submit bounded batches; a first sync can exceed a year of
+                # hourly buckets.
+                for chunk_start in range(0, len(entity_stats), INSERT_CHUNK_SIZE):
                     async_import_statistics(
                         self.hass,
                         stats_meta[entity.key],
-                        stats[entity.key],
+                        entity_stats[chunk_start : chunk_start + INSERT_CHUNK_SIZE],
                     )
+                if debug:
+                    _LOGGER.debug(
+                        "storing sensor.%s stats took %.3f ms",
+                        entity.key,
+                        (time.perf_counter_ns() - t1) / 1e6,
+                    )
+            if debug:
                 _LOGGER.debug(
-                    "storing %s stats took %s",
-                    f"sensor.{entity.key}",
-                    datetime.now() - t1,
-                )
-            if len(states) > 0:
-                t1 = datetime.now()
-                await save_states(self.hass, states)
-                _LOGGER.debug(
-                    "saving state took %s",
-                    datetime.now() - t1,
+                    "Updated %s with %d entries in %.3f ms",
+                    entity_type,
+                    len(stats[entity.key]),
+                    (time.perf_counter_ns() - t0) / 1e6,
                 )
 
-            _LOGGER.debug(
-                f"Updated {entity_type} with {len(stats[entity.key])} entries in {datetime.now() - t0}."
-            )
-        _LOGGER.debug(f"Next poll at {datetime.now() + self.update_interval}.")
+        if len(states) > 0:
+            t1 = time.perf_counter_ns() if debug else 0
+            await save_states(self.hass, states)
+            if debug:
+                _LOGGER.debug("saving state took %.3f ms", (time.perf_counter_ns() - t1) / 1e6)
+        _LOGGER.debug("Next poll at %s.", datetime.now() + self.update_interval)
 
         return {self.account: {}}
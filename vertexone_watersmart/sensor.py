@@ -2,9 +2,6 @@
 from __future__ import annotations
 
 import logging
-from collections.abc import Callable
-from dataclasses import dataclass
-from typing import Any, List, Optional
 
 from homeassistant.components.sensor import (
     SensorEntity,
@@ -20,8 +17,6 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from .const import DOMAIN, NAME
 from .coordinator import V1WSCoordinator, ENTITIES, V1WSEntityDescription
 
-from enum import StrEnum
-
 _LOGGER = logging.getLogger(__name__)
 
 